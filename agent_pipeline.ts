@@ -1,15 +1,20 @@
 import 'dotenv/config';
+import { createHash } from 'node:crypto';
+import { readFileSync } from 'node:fs';
+import { mkdir, readFile, rename, writeFile } from 'node:fs/promises';
+import { homedir } from 'node:os';
+import { join } from 'node:path';
 import { z } from 'zod';
 import { ChatOpenAI } from '@langchain/openai'
 import { Annotation, StateGraph, END, START } from '@langchain/langgraph'
 
-type Side = "PLAYER" | "AI";
-type Personality = "neutral" | "aggressive" | "conservative" | "chaotic";
+export type Side = "PLAYER" | "AI";
+export type Personality = "neutral" | "aggressive" | "conservative" | "chaotic";
 
-const MAINTENANCE_ROUND_INTERVAL = 2;
-const MAINTENANCE_COST_INCREMENT = 5;
+export const MAINTENANCE_ROUND_INTERVAL = 2;
+export const MAINTENANCE_COST_INCREMENT = 5;
 
-type AgentState = {
+export type AgentState = {
   me: Side;
   round: number;
   maintenance_fee: number;
@@ -20,8 +25,9 @@ type AgentState = {
   opp_score: number;
   last_rounds: Array<Record<string, any>>;
   personality: Personality;
+  seed?: number;
 
-  plan?: any;
+  plan?: BidPlanT;
   final_bid?: number;
   reasons?: string[];
 };
@@ -37,63 +43,144 @@ const AgentStateAnnotation = Annotation.Root({
   opp_score: Annotation<number>(),
   last_rounds: Annotation<Array<Record<string, any>>>(),
   personality: Annotation<Personality>(),
-  plan: Annotation<any>(),
+  seed: Annotation<number | undefined>(),
+  plan: Annotation<BidPlanT | undefined>(),
   final_bid: Annotation<number>(),
   reasons: Annotation<string[]>(),
 });
 
-const OpponentRead = z.object({
-  style_label: z.enum(["conservative", "neutral", "aggressive"]),
-  aggression: z.number().min(0).max(1),
-  tilt: z.number().min(0).max(1),
-  volatility: z.number().min(0).max(1),
-});
-
-const OpponentBidForecast = z
-  .object({
-    q10: z.number().int().min(0),
-    q25: z.number().int().min(0),
-    q50: z.number().int().min(0),
-    q75: z.number().int().min(0),
-    q90: z.number().int().min(0),
-  })
-  .superRefine((v, ctx) => {
-    if (!(v.q10 <= v.q25 && v.q25 <= v.q50 && v.q50 <= v.q75 && v.q75 <= v.q90)) {
-      ctx.addIssue({ code: "custom", message: "Forecast quantiles must be monotonic." });
-    }
+// The plan shape is built twice: with numeric bounds for the JSON schema sent to OpenAI
+// (strict json_schema enforces minimum/maximum server-side), and without them for the
+// client-side parse, which then only checks types plus the one cross-field rule below.
+function bidPlanShape(bounded: boolean) {
+  const unit = bounded ? z.number().min(0).max(1) : z.number();
+  const count = bounded ? z.number().int().min(0) : z.number().int();
+
+  return z.strictObject({
+    intent: z.enum(["save", "bait", "spike", "balanced"]),
+    opponent: z.strictObject({
+      style_label: z.enum(["conservative", "neutral", "aggressive"]),
+      aggression: unit,
+      tilt: unit,
+      volatility: unit,
+    }),
+    forecast: z.strictObject({
+      q10: count,
+      q25: count,
+      q50: count,
+      q75: count,
+      q90: count,
+    }),
+    bid_min: count,
+    bid_max: count,
+    notes: z.array(z.string()).min(1),
   });
+}
 
-const BidPlan = z.object({
-  intent: z.enum(["save", "bait", "spike", "balanced"]),
-  opponent: OpponentRead,
-  forecast: OpponentBidForecast,
-  bid_min: z.number().int().min(0),
-  bid_max: z.number().int().min(0),
-  notes: z.array(z.string()).min(1),
+// derived once at import and shared by every planner binding ($schema is not part of
+// OpenAI's response_format payload)
+const BID_PLAN_JSON_SCHEMA: Record<string, any> = z.toJSONSchema(bidPlanShape(true));
+delete BID_PLAN_JSON_SCHEMA.$schema;
+
+const BidPlan = bidPlanShape(false).superRefine((v, ctx) => {
+  const f = v.forecast;
+  if (!(f.q10 <= f.q25 && f.q25 <= f.q50 && f.q50 <= f.q75 && f.q75 <= f.q90)) {
+    ctx.addIssue({ code: "custom", message: "Forecast quantiles must be monotonic." });
+  }
 });
 
+type BidPlanT = z.infer<typeof BidPlan>;
+
+// used when the think step produced no plan
+const FALLBACK_PLAN: BidPlanT = {
+  intent: "balanced",
+  opponent: { style_label: "neutral", aggression: 0, tilt: 0, volatility: 0 },
+  forecast: { q10: 0, q25: 0, q50: 0, q75: 0, q90: 0 },
+  bid_min: 0,
+  bid_max: 0,
+  notes: [],
+};
+
 function clampInt(x: any, lo: number, hi: number) {
-  const v = Number.isFinite(Number(x)) ? Math.trunc(Number(x)) : lo;
+  const n = typeof x === "number" ? x : Number(x);
+  const v = Number.isFinite(n) ? Math.trunc(n) : lo;
   return Math.max(lo, Math.min(v, hi));
 }
 
-function maintenanceFeeForRound(
+// Small seedable PRNG (mulberry32) returning floats in [0, 1), so bids can be replayed
+export type Rng = () => number;
+
+export function makeRng(seed: number): Rng {
+  let a = seed >>> 0;
+  return () => {
+    a = (a + 0x6d2b79f5) >>> 0;
+    let t = a;
+    t = Math.imul(t ^ (t >>> 15), t | 1);
+    t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+// Fee per round for the default schedule, precomputed; rounds past the table (or custom
+// schedules) fall back to the formula.
+const FEE_TABLE_SIZE = 4096;
+const FEE_TABLE: readonly number[] = Array.from({ length: FEE_TABLE_SIZE }, (_, r) =>
+  Math.max(0, Math.floor((r - 1) / MAINTENANCE_ROUND_INTERVAL)) * MAINTENANCE_COST_INCREMENT
+);
+
+export function maintenanceFeeForRound(
   roundNum: number,
   interval = MAINTENANCE_ROUND_INTERVAL,
   inc = MAINTENANCE_COST_INCREMENT
 ) {
+  if (
+    interval === MAINTENANCE_ROUND_INTERVAL &&
+    inc === MAINTENANCE_COST_INCREMENT &&
+    Number.isInteger(roundNum) &&
+    roundNum >= 0 &&
+    roundNum < FEE_TABLE_SIZE
+  ) {
+    return FEE_TABLE[roundNum];
+  }
   const multiplier = Math.max(0, Math.floor((roundNum - 1) / interval));
   return multiplier * inc;
 }
 
-function thinkNode(llm: ChatOpenAI) {
-  const planner = llm.withStructuredOutput(BidPlan);
+// Cached clients: one ChatOpenAI per (model, temperature), one compiled graph per model.
+// Keeps HTTP client setup, structured-output binding and graph compilation off the per-round path.
+const LLM_CACHE_SIZE = 4;
+const llmCache = new Map<string, ChatOpenAI>();
+const pipelineCache = new Map<string, ReturnType<typeof buildPipeline>>();
+
+function rememberBounded<V>(cache: Map<string, V>, key: string, make: () => V): V {
+  const hit = cache.get(key);
+  if (hit !== undefined) {
+    // refresh recency (Map keeps insertion order)
+    cache.delete(key);
+    cache.set(key, hit);
+    return hit;
+  }
+  const value = make();
+  cache.set(key, value);
+  if (cache.size > LLM_CACHE_SIZE) cache.delete(cache.keys().next().value as string);
+  return value;
+}
+
+function getLlm(model: string, temperature = 0.2): ChatOpenAI {
+  return rememberBounded(llmCache, `${model}:${temperature}`, () => {
+    const apiKey = process.env.OPENAI_API_KEY;
+    if (!apiKey) throw new Error("OPENAI_API_KEY is not set. Put it in your .env file.");
+    return new ChatOpenAI({ model, apiKey, temperature });
+  });
+}
 
-  return async (s: AgentState): Promise<AgentState> => {
-    const reasons = s.reasons ?? [];
-    const outlook = s.maintenance_outlook ?? {};
+export function getPipeline(model = "gpt-4o-mini") {
+  return rememberBounded(pipelineCache, model, () => buildPipeline(model));
+}
 
-    const prompt = `
+// Invariant part of the bidder prompt. Kept first and byte-identical across rounds so
+// OpenAI's automatic prompt caching can reuse it; per-round state goes after it.
+const BIDDER_RULES = `
 You are an adaptive bidding agent in a repeated sealed-bid all-pay auction with maintenance and walkover.
 
 Key facts (do not forget):
@@ -101,6 +188,8 @@ Key facts (do not forget):
 - Money never increases; it only decreases.
 - Maintenance is paid BEFORE bidding each round; if you cannot pay it, you are eliminated and walkover occurs.
 - Therefore: preserving liquidity to keep paying maintenance can be worth more than winning a single round.
+- Recent rounds list round, bids, winner and maintenance fee only; bankrolls are implicit from bids and prior state.
+- me= is your seat: player_bid and winner=PLAYER are yours when me=PLAYER, ai_bid and winner=AI when me=AI.
 
 Objective:
 Maximize FINAL score under rising maintenance + limited capital.
@@ -108,17 +197,6 @@ Maximize FINAL score under rising maintenance + limited capital.
 Cold-start prior (when data is sparse):
 Assume opponent median bid is 10–20% of their bankroll, not 0.
 
-This round:
-round=${s.round}
-maintenance_fee_paid_this_round=${s.maintenance_fee}
-maintenance_outlook_next=${JSON.stringify(outlook)}
-my_money=${s.my_money} opp_money=${s.opp_money}
-my_score=${s.my_score} opp_score=${s.opp_score}
-personality=${s.personality}
-
-Recent rounds (most recent last):
-${JSON.stringify(s.last_rounds ?? [])}
-
 Output requirements:
 - forecast quantiles must be monotonic: q10<=q25<=q50<=q75<=q90
 - forecast quantiles are integers in [0, opp_money]
@@ -129,7 +207,188 @@ Output requirements:
 - notes: 3–6 short bullets, actionable.
 `.trim();
 
-    const plan = await planner.invoke(prompt);
+type Planner = ReturnType<typeof bindPlanner>;
+
+// Native json_schema response format in strict mode: the server enforces the schema, so
+// malformed plans no longer cost a failed parse. Shared by every planner binding.
+const BID_PLAN_OUTPUT = { name: "BidPlan", method: "jsonSchema", strict: true } as const;
+
+function bindPlanner(llm: ChatOpenAI) {
+  return llm.withStructuredOutput(BID_PLAN_JSON_SCHEMA, BID_PLAN_OUTPUT);
+}
+
+// Plans are cached on disk keyed by a hash of the decision-relevant state, so repeated
+// states (cold-start rounds, replays) skip the LLM. Set ELEVATETM_PLAN_CACHE=0 to disable.
+const PLANNER_TEMPERATURE = 0;
+const PLAN_CACHE_ENABLED = process.env.ELEVATETM_PLAN_CACHE !== "0";
+const PLAN_CACHE_PATH = join(homedir(), ".elevatetm_plan_cache.json");
+// least recently used entries are evicted past this, so the file (and each rewrite) stays bounded
+const PLAN_CACHE_MAX_ENTRIES = 5000;
+const PLAN_KEY_FIELDS = [
+  "me",
+  "round",
+  "maintenance_fee",
+  "my_money",
+  "opp_money",
+  "my_score",
+  "opp_score",
+  "personality",
+  "last_rounds",
+  "maintenance_outlook",
+] as const;
+
+// insertion-ordered (hits are re-inserted), so the first key is the least recently used
+let planCache: Map<string, unknown> | null = null;
+let planCacheWrite: Promise<void> = Promise.resolve();
+let planCacheWritePending = false;
+
+// JSON.stringify with object keys sorted, so equal values always hash the same
+function stableStringify(value: any): string {
+  if (Array.isArray(value)) return `[${value.map(stableStringify).join(",")}]`;
+  if (value && typeof value === "object") {
+    const keys = Object.keys(value).sort();
+    return `{${keys.map((k) => `${JSON.stringify(k)}:${stableStringify(value[k])}`).join(",")}}`;
+  }
+  return JSON.stringify(value ?? null);
+}
+
+// fingerprint of the prompt and output schema; editing either invalidates every cached plan
+const PLAN_CACHE_VERSION = createHash("sha256")
+  .update(BIDDER_RULES)
+  .update(stableStringify(BID_PLAN_JSON_SCHEMA))
+  .digest("hex")
+  .slice(0, 16);
+
+function planCacheKey(model: string, s: AgentState) {
+  const picked: Record<string, unknown> = { model, version: PLAN_CACHE_VERSION };
+  for (const k of PLAN_KEY_FIELDS) picked[k] = s[k];
+  return createHash("blake2b512").update(stableStringify(picked)).digest("hex");
+}
+
+function loadPlanCache() {
+  if (planCache) return planCache;
+  try {
+    planCache = new Map(Object.entries(JSON.parse(readFileSync(PLAN_CACHE_PATH, "utf8"))));
+  } catch {
+    planCache = new Map();
+  }
+  return planCache;
+}
+
+// Entries on disk may come from an older schema or be hand-edited: anything that no
+// longer parses as a BidPlan is dropped and treated as a miss.
+function lookupPlan(key: string): BidPlanT | undefined {
+  const cache = loadPlanCache();
+  const entry = cache.get(key);
+  if (entry === undefined) return undefined;
+  const parsed = BidPlan.safeParse(entry);
+  cache.delete(key);
+  if (!parsed.success) return undefined;
+  // re-insert so eviction drops the least recently used entries first
+  cache.set(key, entry);
+  return parsed.data;
+}
+
+function storePlan(key: string, plan: BidPlanT) {
+  const cache = loadPlanCache();
+  cache.set(key, plan);
+  while (cache.size > PLAN_CACHE_MAX_ENTRIES) {
+    cache.delete(cache.keys().next().value as string);
+  }
+  schedulePlanCacheWrite();
+}
+
+// Writes are serialized and coalesced (a burst of misses during a batch sweep becomes
+// one write), and go through a temp file + rename so a crash can't leave a torn file.
+function schedulePlanCacheWrite() {
+  if (planCacheWritePending) return;
+  planCacheWritePending = true;
+  planCacheWrite = planCacheWrite
+    .then(async () => {
+      planCacheWritePending = false;
+      const tmp = `${PLAN_CACHE_PATH}.${process.pid}.tmp`;
+      await writeFile(tmp, JSON.stringify(Object.fromEntries(loadPlanCache())));
+      await rename(tmp, PLAN_CACHE_PATH);
+    })
+    .catch((err) => console.error("Could not persist plan cache:", err.message));
+}
+
+const RECENT_ROUNDS_HEADER = "round,player_bid,ai_bid,winner,fee";
+
+// Recent rounds as compact CSV rather than JSON (no repeated keys/quotes)
+function formatRecentRounds(rows: Array<Record<string, any>>): string {
+  const lines = [RECENT_ROUNDS_HEADER];
+  for (const r of rows) {
+    lines.push(`${r.round},${r.player_bid},${r.ai_bid},${r.winner ?? "TIE"},${r.fee}`);
+  }
+  return lines.join("\n");
+}
+
+// Per-round tail of the prompt; everything before it is the static BIDDER_RULES prefix
+function formatRoundState(s: AgentState): string {
+  return [
+    "\n\nThis round:",
+    `me=${s.me}`,
+    `round=${s.round}`,
+    `maintenance_fee_paid_this_round=${s.maintenance_fee}`,
+    `maintenance_outlook_next=${JSON.stringify(s.maintenance_outlook ?? {})}`,
+    `my_money=${s.my_money} opp_money=${s.opp_money}`,
+    `my_score=${s.my_score} opp_score=${s.opp_score}`,
+    `personality=${s.personality}`,
+    "",
+    "Recent rounds (most recent last):",
+    formatRecentRounds(s.last_rounds ?? []),
+  ].join("\n");
+}
+
+// Rounds whose best bid is forced don't need the LLM: returns a plan for those, else null.
+function trivialPlan(s: AgentState): BidPlanT | null {
+  const myMoney = s.my_money;
+  const nextFee = s.maintenance_outlook?.next_round ?? 0;
+
+  const forced = (intent: BidPlanT["intent"], bid: number, note: string): BidPlanT => ({
+    ...FALLBACK_PLAN,
+    intent,
+    bid_min: bid,
+    bid_max: bid,
+    notes: [note],
+  });
+
+  if (myMoney === 0) {
+    return forced("save", 0, "No money left: bid 0.");
+  }
+  if (nextFee > myMoney) {
+    return forced("spike", myMoney, `Next maintenance $${nextFee} is unaffordable: spend everything now.`);
+  }
+  if (s.opp_money === 0) {
+    // opponent can only bid 0, so $1 wins if we can spare it after next maintenance
+    const bid = myMoney - nextFee >= 1 ? 1 : 0;
+    return forced("balanced", bid, `Opponent is broke: bid $${bid}.`);
+  }
+  return null;
+}
+
+function thinkNode(planner: Planner, model: string) {
+  return async (s: AgentState): Promise<AgentState> => {
+    const reasons = s.reasons ?? [];
+
+    const forced = trivialPlan(s);
+    if (forced) {
+      reasons.push(`Intent: ${forced.intent} | Personality: ${s.personality} (rule-based, no LLM call)`);
+      reasons.push(...forced.notes);
+      return { ...s, plan: forced, reasons };
+    }
+
+    const key = PLAN_CACHE_ENABLED ? planCacheKey(model, s) : null;
+    let plan = key ? lookupPlan(key) : undefined;
+    if (plan) {
+      reasons.push("Plan reused from cache (identical state seen before).");
+    }
+    else {
+      const prompt = BIDDER_RULES + formatRoundState(s);
+      plan = BidPlan.parse(await planner.invoke(prompt));
+      if (key) storePlan(key, plan);
+    }
 
     reasons.push(`Intent: ${plan.intent} | Personality: ${s.personality}`);
     reasons.push(
@@ -147,14 +406,17 @@ Output requirements:
 }
 
 async function finalizeNode(s: AgentState): Promise<AgentState> {
+  // the RNG is derived per invocation from the per-game seed, so a (seed, round) pair
+  // always draws the same bid no matter which (shared, cached) graph runs it
+  const rng: Rng = s.seed !== undefined ? makeRng(s.seed * 1000003 + s.round) : Math.random;
   const reasons = s.reasons ?? [];
   const myMoney = s.my_money;
   const oppMoney = s.opp_money;
 
-  const plan = s.plan ?? { intent: "balanced", bid_min: 0, bid_max: 0, forecast: {} };
-  const intent = String(plan.intent ?? "balanced");
+  const plan = s.plan ?? FALLBACK_PLAN;
+  const intent = plan.intent;
 
-  const nextFee = Number(s.maintenance_outlook?.next_round ?? 0);
+  const nextFee = s.maintenance_outlook?.next_round ?? 0;
   const doomedNext = nextFee > myMoney;
 
   const spendable = doomedNext ? myMoney : Math.max(0, myMoney - nextFee);
@@ -165,33 +427,37 @@ async function finalizeNode(s: AgentState): Promise<AgentState> {
       : `Guardrail: reserved next maintenance $${nextFee}, spendable=${spendable}.`
   );
 
+  // clampInt only for values that come from the LLM; everything else is already an int
   let bidMin = clampInt(plan.bid_min, 0, spendable);
   let bidMax = clampInt(plan.bid_max, 0, spendable);
   if (bidMax < bidMin) bidMax = bidMin;
 
-  // random int in [bidMin, bidMax]
+  // random int in [bidMin, bidMax] (already within [0, spendable] <= my_money)
   const finalBid =
-    bidMax > bidMin ? bidMin + Math.floor(Math.random() * (bidMax - bidMin + 1)) : bidMin;
+    bidMax > bidMin ? bidMin + Math.floor(rng() * (bidMax - bidMin + 1)) : bidMin;
 
   // clamp forecast to opp bankroll (extra sanity)
-  const forecast = { ...(plan.forecast ?? {}) };
-  for (const k of ["q10", "q25", "q50", "q75", "q90"] as const) {
-    if (forecast[k] !== undefined) forecast[k] = clampInt(forecast[k], 0, oppMoney);
-  }
+  const f = plan.forecast;
+  const forecast = {
+    q10: clampInt(f.q10, 0, oppMoney),
+    q25: clampInt(f.q25, 0, oppMoney),
+    q50: clampInt(f.q50, 0, oppMoney),
+    q75: clampInt(f.q75, 0, oppMoney),
+    q90: clampInt(f.q90, 0, oppMoney),
+  };
 
   reasons.push(`LLM range [${bidMin},${bidMax}] -> final bid $${finalBid} (intent=${intent})`);
 
-  return { ...s, plan: { ...plan, forecast }, final_bid: clampInt(finalBid, 0, myMoney), reasons };
+  return { ...s, plan: { ...plan, forecast }, final_bid: finalBid, reasons };
 }
 
 export function buildPipeline(model = "gpt-4o-mini") {
-  const apiKey = process.env.OPENAI_API_KEY;
-  if (!apiKey) throw new Error("OPENAI_API_KEY is not set. Put it in your .env file.");
-
-  const llm = new ChatOpenAI({ model, apiKey, temperature: 0.2 });
+  // structured-output binding is done once per compiled graph, not per round
+  // temperature 0 so a cached plan is what the model would have answered anyway
+  const planner = bindPlanner(getLlm(model, PLANNER_TEMPERATURE));
 
   const g = new StateGraph(AgentStateAnnotation)
-    .addNode("think", thinkNode(llm))
+    .addNode("think", thinkNode(planner, model))
     .addNode("finalize", finalizeNode)
     .addEdge(START, "think")
     .addEdge("think", "finalize")
@@ -225,67 +491,148 @@ export type GameState = {
     current_round: number;
     maintenance_fee_current: number;
     history: RoundSummary[];
+    // optional pre-serialized last LOOKBACK_ROUNDS rows (see summarizeRound), kept by the game
+    history_window?: Array<Record<string, any>>;
+}
+
+// How many recent rounds the agent sees
+export const LOOKBACK_ROUNDS = 6;
+
+// One history row as shown to the agent. Money after the round is left out: it follows
+// from the bids and fees, and dropping it keeps the prompt short.
+export function summarizeRound(
+  r: Pick<RoundSummary, "round" | "player_bid" | "ai_bid" | "maintenance_fee_of_round"> & { winner: string | null }
+) {
+  return {
+    round: r.round,
+    player_bid: r.player_bid,
+    ai_bid: r.ai_bid,
+    winner: r.winner,
+    fee: r.maintenance_fee_of_round,
+  };
 }
 
 export interface GraphLike {
   invoke(state: AgentState): Promise<AgentState> | AgentState;
 }
 
-export async function chooseBid(
-  graph: GraphLike,
+export interface BatchGraphLike extends GraphLike {
+  batch(states: AgentState[], options?: { maxConcurrency?: number }): Promise<AgentState[]>;
+}
+
+// Upper bound on in-flight OpenAI requests for batched sweeps (keeps us under TPM limits)
+export const BATCH_MAX_CONCURRENCY = 20;
+
+export function buildAgentState(
   state: GameState,
   me: Side,
   personality: Personality = "neutral",
-  lookback = 6,
+  lookback = LOOKBACK_ROUNDS,
   maintenanceInterval = MAINTENANCE_ROUND_INTERVAL,
-  maintenanceIncrement = MAINTENANCE_COST_INCREMENT
-): Promise<[number, string[]]> {
+  maintenanceIncrement = MAINTENANCE_COST_INCREMENT,
+  seed?: number
+): AgentState {
   const my = me === "PLAYER" ? state.player : state.ai;
   const opp = me === "PLAYER" ? state.ai : state.player;
 
-  const history = state.history.slice(-lookback).map((r) => ({
-    round: r.round,
-    player_bid: r.player_bid,
-    ai_bid: r.ai_bid,
-    winner: r.winner,
-    fee: r.maintenance_fee_of_round,
-    p_after: r.p_money_after_b,
-    a_after: r.a_money_after_b,
-  }));
+  // reuse the game's rolling window when it covers the lookback; otherwise rebuild rows
+  const history = state.history_window && lookback <= LOOKBACK_ROUNDS
+    ? state.history_window.slice(-lookback)
+    : state.history.slice(-lookback).map(summarizeRound);
 
-    const r = Number(state.current_round);
-    const outlook = {
+  const r = Number(state.current_round);
+  const outlook = {
     next_round: maintenanceFeeForRound(r + 1, maintenanceInterval, maintenanceIncrement),
     in_2_rounds: maintenanceFeeForRound(r + 2, maintenanceInterval, maintenanceIncrement),
     in_3_rounds: maintenanceFeeForRound(r + 3, maintenanceInterval, maintenanceIncrement),
   };
 
-    const agentState: AgentState = {
-      me,
-      round: r,
-      maintenance_fee: Number(state.maintenance_fee_current),
-      maintenance_outlook: outlook,
-      my_money: Number(my.money),
-      opp_money: Number(opp.money),
-      my_score: Number(my.score),
-      opp_score: Number(opp.score),
-      last_rounds: history,
-      personality,
-      reasons: [],
-    };
-  
-    const result = await graph.invoke(agentState);
-    return [Number(result.final_bid ?? 0), result.reasons ?? []];
+  return {
+    me,
+    round: r,
+    maintenance_fee: Number(state.maintenance_fee_current),
+    maintenance_outlook: outlook,
+    my_money: Number(my.money),
+    opp_money: Number(opp.money),
+    my_score: Number(my.score),
+    opp_score: Number(opp.score),
+    last_rounds: history,
+    personality,
+    seed,
+    reasons: [],
+  };
+}
+
+export async function chooseBid(
+  graph: GraphLike,
+  state: GameState,
+  me: Side,
+  personality: Personality = "neutral",
+  lookback = LOOKBACK_ROUNDS,
+  maintenanceInterval = MAINTENANCE_ROUND_INTERVAL,
+  maintenanceIncrement = MAINTENANCE_COST_INCREMENT,
+  seed?: number
+): Promise<[number, string[]]> {
+  const agentState = buildAgentState(
+    state, me, personality, lookback, maintenanceInterval, maintenanceIncrement, seed
+  );
+
+  const result = await graph.invoke(agentState);
+  return [Number(result.final_bid ?? 0), result.reasons ?? []];
+}
+
+// Runs many pending decisions (e.g. one per game in an offline sweep) through a single
+// concurrent graph.batch call instead of one sequential round-trip each.
+export async function chooseBidsBatch(
+  graph: BatchGraphLike,
+  agentStates: AgentState[],
+  maxConcurrency = BATCH_MAX_CONCURRENCY
+): Promise<Array<[number, string[]]>> {
+  if (agentStates.length === 0) return [];
+  const results = await graph.batch(agentStates, { maxConcurrency });
+  return results.map((r): [number, string[]] => [Number(r.final_bid ?? 0), r.reasons ?? []]);
+}
+
+  // Finished reports are cached on disk, one file per sha256(model + context), so replays
+  // of the same game skip the LLM. Set ELEVATETM_REPORT_CACHE=0 to bypass.
+  const REPORT_CACHE_ENABLED = process.env.ELEVATETM_REPORT_CACHE !== "0";
+  const REPORT_CACHE_DIR = join(homedir(), ".cache", "elevatetm", "reports");
+
+  function reportCachePath(model: string, context: Record<string, any>) {
+    const key = createHash("sha256").update(stableStringify({ model, context })).digest("hex");
+    return join(REPORT_CACHE_DIR, `${key}.txt`);
   }
-  
-  // Reporter Agent (unchanged)
-  export async function generateReport(context: Record<string, any>, model = "gpt-4o-mini") {
-    const apiKey = process.env.OPENAI_API_KEY;
-    if (!apiKey) {
-      throw new Error("OPENAI_API_KEY is not set; check your environment or .env file.");
+
+  async function storeReport(file: string, text: string) {
+    try {
+      await mkdir(REPORT_CACHE_DIR, { recursive: true });
+      // write-then-rename, like the plan cache, so readers never see a truncated report
+      const tmp = `${file}.${process.pid}.tmp`;
+      await writeFile(tmp, text);
+      await rename(tmp, file);
+    } catch (err: any) {
+      console.error("Could not persist report cache:", err.message);
     }
-  
-    const llm = new ChatOpenAI({ model, apiKey, temperature: 0.2 });
+  }
+
+  // Reporter Agent
+  // Pass onToken to stream the report as it is generated (first text shows up at TTFT
+  // instead of after the full completion); the full text is still returned.
+  export async function generateReport(
+    context: Record<string, any>,
+    model = "gpt-4o-mini",
+    onToken?: (text: string) => void
+  ) {
+    const cacheFile = REPORT_CACHE_ENABLED ? reportCachePath(model, context) : null;
+    if (cacheFile) {
+      const hit = await readFile(cacheFile, "utf8").catch(() => null);
+      if (hit !== null) {
+        onToken?.(hit);
+        return hit;
+      }
+    }
+
+    const llm = getLlm(model);
   
     const prompt = `
   You are a concise game analyst. Review the structured game summary and produce a formatted capital profile block (text-only).
@@ -377,8 +724,21 @@ export async function chooseBid(
   ${JSON.stringify(context)}
   `.trim();
   
-    const resp = await llm.invoke(prompt);
-    return typeof resp.content === "string" ? resp.content : JSON.stringify(resp.content);
+    let text = "";
+    if (onToken) {
+      for await (const chunk of await llm.stream(prompt)) {
+        const piece = typeof chunk.content === "string" ? chunk.content : JSON.stringify(chunk.content);
+        text += piece;
+        onToken(piece);
+      }
+    }
+    else {
+      const resp = await llm.invoke(prompt);
+      text = typeof resp.content === "string" ? resp.content : JSON.stringify(resp.content);
+    }
+
+    if (cacheFile && text) await storeReport(cacheFile, text);
+    return text;
   }
 
 
@@ -1,13 +1,25 @@
-import { buildPipeline, chooseBid, generateReport, type GraphLike } from "./agent_pipeline.ts"
-import readlineSync from "readline-sync";
+import {
+    getPipeline,
+    chooseBid,
+    buildAgentState,
+    chooseBidsBatch,
+    summarizeRound,
+    LOOKBACK_ROUNDS,
+    MAINTENANCE_ROUND_INTERVAL,
+    MAINTENANCE_COST_INCREMENT,
+    maintenanceFeeForRound,
+    generateReport,
+    type GraphLike,
+    type BatchGraphLike,
+} from "./agent_pipeline.ts"
+import * as readline from "node:readline/promises";
+import { pathToFileURL } from "node:url";
 
 
 console.log("test")
 
 // Constants
 export const STARTING_AMT: number = 100;
-const MAINTENANCE_ROUND_INTERVAL: number = 2
-const MAINTENANCE_COST_INCREMENT: number = 5
 
 
 
@@ -24,22 +36,23 @@ export class PlayerState {
   }
 }
 
+// Immutable once recorded into GameState.history
 export class RoundRecord {
-  round: number;
-  player_bid: number;
-  ai_bid: number;
-  winner: string | null;
-  maintenance_fee_of_round: number;
-
-  p_score: number;
-  p_money_before_m: number;
-  p_money_before_b: number;
-  p_money_after_b: number;
-
-  a_score: number;
-  a_money_before_m: number;
-  a_money_before_b: number;
-  a_money_after_b: number;
+  readonly round: number;
+  readonly player_bid: number;
+  readonly ai_bid: number;
+  readonly winner: string | null;
+  readonly maintenance_fee_of_round: number;
+
+  readonly p_score: number;
+  readonly p_money_before_m: number;
+  readonly p_money_before_b: number;
+  readonly p_money_after_b: number;
+
+  readonly a_score: number;
+  readonly a_money_before_m: number;
+  readonly a_money_before_b: number;
+  readonly a_money_after_b: number;
 
   constructor(
     round: number,
@@ -77,6 +90,17 @@ export class RoundRecord {
 }
 
 
+export type ReportRound = {
+  round: number;
+  player_bid: number;
+  ai_bid: number;
+  winner: string | null;
+  maintenance_fee: number;
+  p_money_after: number;
+  a_money_after: number;
+};
+
+
 export class GameState {
   starting_money: number;
   current_round: number;
@@ -85,6 +109,20 @@ export class GameState {
   ai: PlayerState;
   history: RoundRecord[];
 
+  // running aggregates over history, kept up to date by record_round()
+  player_wins: number = 0;
+  ai_wins: number = 0;
+  ties: number = 0;
+  player_bid_sum: number = 0;
+  player_bid_max: number = 0;
+  ai_bid_sum: number = 0;
+  ai_bid_max: number = 0;
+  maintenance_total: number = 0;
+  // report rows already built from history (see report_rows)
+  private report_rows_cache: ReportRound[] = [];
+  // last LOOKBACK_ROUNDS rounds, already in the shape the agent prompt uses
+  history_window: ReturnType<typeof summarizeRound>[] = [];
+
   constructor(
     starting_money: number,
     current_round: number,
@@ -98,20 +136,75 @@ export class GameState {
     this.maintenance_fee_current = maintenance_fee_current;
     this.player = player;
     this.ai = ai;
-    this.history = history;
+    this.history = [];
+    for (const rec of history) {
+      this.record_round(rec);
+    }
+  }
+
+  // append a round to history and fold it into the running aggregates
+  record_round(rec: RoundRecord) {
+    this.history.push(rec);
+
+    if (rec.winner === "PLAYER") {
+      this.player_wins += 1;
+    }
+    else if (rec.winner === "AI") {
+      this.ai_wins += 1;
+    }
+    else {
+      this.ties += 1;
+    }
+
+    this.player_bid_sum += rec.player_bid;
+    this.player_bid_max = Math.max(this.player_bid_max, rec.player_bid);
+    this.ai_bid_sum += rec.ai_bid;
+    this.ai_bid_max = Math.max(this.ai_bid_max, rec.ai_bid);
+    this.maintenance_total += rec.maintenance_fee_of_round;
+
+    this.history_window.push(summarizeRound(rec));
+    if (this.history_window.length > LOOKBACK_ROUNDS) {
+      this.history_window.shift();
+    }
+  }
+
+  // each round is turned into a report row once; later calls only serialize new rounds
+  report_rows(): ReportRound[] {
+    const out = this.report_rows_cache;
+    for (let i = out.length; i < this.history.length; i++) {
+      const r = this.history[i];
+      out.push({
+        round: r.round,
+        player_bid: r.player_bid,
+        ai_bid: r.ai_bid,
+        winner: r.winner,
+        maintenance_fee: r.maintenance_fee_of_round,
+        p_money_after: r.p_money_after_b,
+        a_money_after: r.a_money_after_b
+      });
+    }
+    // shallow copy so callers can't disturb the cache
+    return out.slice();
+  }
+
+  // wire format stays the same: aggregates are rebuilt from history by hydrate_state
+  toJSON() {
+    return {
+      starting_money: this.starting_money,
+      current_round: this.current_round,
+      maintenance_fee_current: this.maintenance_fee_current,
+      player: this.player,
+      ai: this.ai,
+      history: this.history,
+    };
   }
 }
 
 
 
-// function to get calculate maintenance fees
+// function to get calculate maintenance fees (shared schedule/table lives in agent_pipeline)
 function calculate_maintenance_fee(roundNum: number): number {
-    const multiplier = Math.max(
-        0,
-        Math.floor((roundNum - 1) / MAINTENANCE_ROUND_INTERVAL)
-    );
-
-    return multiplier * MAINTENANCE_COST_INCREMENT;
+    return maintenanceFeeForRound(roundNum);
 }
 
 
@@ -202,77 +295,72 @@ AI score:        ${rec.a_score}
 
 // function for walkover
 function walkover(bankrupt: string, state: GameState, start_from_next_round: boolean = false) {
-    
-    let round_num: number;
-    let winner = null;
 
-    if (start_from_next_round) {
-        round_num = state.current_round + 1;
-    }
-    else {
-        round_num = state.current_round;
+    if (bankrupt === "TIE") {
+        return;
     }
 
+    const player = state.player;
+    const ai = state.ai;
+
+    let round_num = start_from_next_round ? state.current_round + 1 : state.current_round;
+    let winner = null;
+
+    // fee only changes every MAINTENANCE_ROUND_INTERVAL rounds, so step it instead of recomputing
+    let fee = calculate_maintenance_fee(round_num);
+    let next_fee_round =
+        (Math.max(0, Math.floor((round_num - 1) / MAINTENANCE_ROUND_INTERVAL)) + 1) * MAINTENANCE_ROUND_INTERVAL + 1;
+
     while (true) {
 
-        if (bankrupt === "TIE") {
-            return;
+        if (round_num >= next_fee_round) {
+            fee += MAINTENANCE_COST_INCREMENT;
+            next_fee_round += MAINTENANCE_ROUND_INTERVAL;
         }
 
-        const p_money_before_m = state.player.money;
-        const a_money_before_m = state.ai.money;
+        const p_money_before_m = player.money;
+        const a_money_before_m = ai.money;
 
-        state.maintenance_fee_current = calculate_maintenance_fee(round_num);
+        state.maintenance_fee_current = fee;
 
         if (bankrupt == "PLAYER") {
-            if(state.maintenance_fee_current <= state.ai.money) {
-                winner = "AI"
-                state.ai.score += 1
-                state.ai.money -= state.maintenance_fee_current
-            }
-            else {
+            if (fee > a_money_before_m) {
                 return
             }
+            winner = "AI"
+            ai.score += 1
+            ai.money = a_money_before_m - fee
         }
         else if (bankrupt == "AI") {
-            if(state.maintenance_fee_current <= state.player.money) {
-                winner = "PLAYER"
-                state.player.score += 1
-                state.player.money -= state.maintenance_fee_current
-            }
-            else {
+            if (fee > p_money_before_m) {
                 return
             }
+            winner = "PLAYER"
+            player.score += 1
+            player.money = p_money_before_m - fee
         }
 
-        // store money before bid
-
-        const p_bid = 0
-        const a_bid = 0
-
-
-
-        // Record round data
+        // Record round data (no bids during a walkover)
         const rec = new RoundRecord(
             state.current_round,
-            p_bid,
-            a_bid,
+            0,
+            0,
             winner,
-            state.maintenance_fee_current,
+            fee,
 
-            state.player.score,
+            player.score,
             p_money_before_m,
-            state.player.money,
-            state.player.money,
+            player.money,
+            player.money,
 
-            state.ai.score,
+            ai.score,
             a_money_before_m,
-            state.ai.money,
-            state.ai.money,
+            ai.money,
+            ai.money,
         );
 
         // add round record to gamestate history
-        state.history.push(rec);
+        state.record_round(rec);
 
         // print walkover
         console.log(`
@@ -280,7 +368,7 @@ function walkover(bankrupt: string, state: GameState, start_from_next_round: boo
                 WALKOVER
 ---------------------------------------
 ROUND:           ${round_num}
-MAINTENANCE FEE: ${state.maintenance_fee_current}
+MAINTENANCE FEE: ${fee}
 
 PLAYER money:    ${rec.p_money_after_b}
 PLAYER score:    ${rec.p_score}
@@ -298,61 +386,29 @@ AI score:        ${rec.a_score}
 
 
 // function to generate report context
-function avg(nums: number[]): number {
-  return nums.length > 0
-    ? nums.reduce((a, b) => a + b, 0) / nums.length
-    : 0;
+function avg(total: number, count: number): number {
+  return count > 0 ? total / count : 0;
 }
 
 export function build_report_context(state: GameState) {
-  const history = state.history;
   // Use completed rounds (history length) instead of current_round (which is 1-based and pre-incremented)
-  const rounds = history.length;
-
-  const player_wins = history.filter(r => r.winner === "PLAYER").length;
-  const ai_wins = history.filter(r => r.winner === "AI").length;
-  const ties = rounds - player_wins - ai_wins;
-
-  const player_bids: number[] = [];
-  const ai_bids: number[] = [];
-
-  let maintenance_total = 0;
-
-  for (const rec of history) {
-    player_bids.push(rec.player_bid);
-    ai_bids.push(rec.ai_bid);
-    maintenance_total += rec.maintenance_fee_of_round;
-  }
-
-  const player_total = player_bids.reduce((a, b) => a + b, 0);
-  const ai_total = ai_bids.reduce((a, b) => a + b, 0);
-
-  const player_max = player_bids.length > 0 ? Math.max(...player_bids) : 0;
-  const ai_max = ai_bids.length > 0 ? Math.max(...ai_bids) : 0;
+  const rounds = state.history.length;
 
   return {
     rounds: rounds,
     scores: { player: state.player.score, ai: state.ai.score },
     money_final: { player: state.player.money, ai: state.ai.money },
-    wins: { player: player_wins, ai: ai_wins, ties: ties },
+    wins: { player: state.player_wins, ai: state.ai_wins, ties: state.ties },
     bids: {
-      player_avg: avg(player_bids),
-      ai_avg: avg(ai_bids),
-      player_max: player_max,
-      ai_max: ai_max,
-      player_total: player_total,
-      ai_total: ai_total,
+      player_avg: avg(state.player_bid_sum, rounds),
+      ai_avg: avg(state.ai_bid_sum, rounds),
+      player_max: state.player_bid_max,
+      ai_max: state.ai_bid_max,
+      player_total: state.player_bid_sum,
+      ai_total: state.ai_bid_sum,
     },
-    maintenance_total_paid: maintenance_total,
-    history: history.map(r => ({
-      round: r.round,
-      player_bid: r.player_bid,
-      ai_bid: r.ai_bid,
-      winner: r.winner,
-      maintenance_fee: r.maintenance_fee_of_round,
-      p_money_after: r.p_money_after_b, 
-      a_money_after: r.a_money_after_b
-    })),
+    maintenance_total_paid: state.maintenance_total,
+    history: state.report_rows(),
   };
 }
 
@@ -405,13 +461,9 @@ export function hydrate_state(raw: any): GameState {
     );
 }
 
-// Lazy singleton pipeline so we don't rebuild the graph every round/request
-let cachedGraph: GraphLike | null = null;
+// Shared pipeline so we don't rebuild the graph every round/request
 export function getGraph(): GraphLike {
-    if (!cachedGraph) {
-        cachedGraph = buildPipeline();
-    }
-    return cachedGraph;
+    return getPipeline();
 }
 
 export type RoundOutcome = {
@@ -421,7 +473,16 @@ export type RoundOutcome = {
     aiReasons?: string[];
 };
 
-export async function play_round(state: GameState, player_bid: number, graph: GraphLike = getGraph()): Promise<RoundOutcome> {
+export type RoundStart = {
+    p_money_before_m: number;
+    a_money_before_m: number;
+    p_money_before_b: number;
+    a_money_before_b: number;
+};
+
+// first half of a round: charge maintenance. Returns the money snapshots, or the
+// outcome if the game ended because someone could not pay.
+export function begin_round(state: GameState): RoundStart | RoundOutcome {
     // Storing player's money at the start of the game (before maintenance costs)
     const p_money_before_m = state.player.money;
     const a_money_before_m = state.ai.money;
@@ -435,10 +496,6 @@ export async function play_round(state: GameState, player_bid: number, graph: Gr
     // Apply maintenance fees and check that everyone can pay
     const ok = apply_maintenance_fee(state, state.player, state.ai);
 
-    // Storing player's money after paying maintenance fees and before bid
-    const p_money_before_b = state.player.money;
-    const a_money_before_b = state.ai.money;
-
     if (!ok) {
         if (p_money_before_m < m_fee && a_money_before_m < m_fee) {
             console.log("Both players could not afford maintenance fees.");
@@ -457,11 +514,28 @@ export async function play_round(state: GameState, player_bid: number, graph: Gr
         }
     }
 
-    // Clamp player bid to available money
-    const p_bid = Math.max(0, Math.min(player_bid, p_money_before_b));
+    // Storing player's money after paying maintenance fees and before bid
+    return {
+        p_money_before_m,
+        a_money_before_m,
+        p_money_before_b: state.player.money,
+        a_money_before_b: state.ai.money,
+    };
+}
 
-    // Get bid from AI
-    const [a_bid, desc] = await chooseBid(graph as any, state as any, "AI");
+// second half of a round: settle both bids, record the round and check for elimination
+// on_recorded (used by the CLI) runs once the round is recorded, before elimination handling
+export function resolve_round(
+    state: GameState,
+    start: RoundStart,
+    player_bid: number,
+    ai_bid: number,
+    desc: string[],
+    on_recorded?: (rec: RoundRecord) => void
+): RoundOutcome {
+    // Clamp bids to available money
+    const p_bid = Math.max(0, Math.min(player_bid, start.p_money_before_b));
+    const a_bid = Math.max(0, Math.min(ai_bid, start.a_money_before_b));
 
     // determine winner
     const winner = round_winner(p_bid, a_bid);
@@ -477,18 +551,19 @@ export async function play_round(state: GameState, player_bid: number, graph: Gr
         state.maintenance_fee_current,
 
         state.player.score,
-        p_money_before_m,
-        p_money_before_b,
+        start.p_money_before_m,
+        start.p_money_before_b,
         state.player.money,
 
         state.ai.score,
-        a_money_before_m,
-        a_money_before_b,
+        start.a_money_before_m,
+        start.a_money_before_b,
         state.ai.money,
     );
 
     // add round record to gamestate history
-    state.history.push(rec);
+    state.record_round(rec);
+    on_recorded?.(rec);
 
     // immediate elimination due to bidding
     if (state.player.money == 0 && state.ai.money == 0) {
@@ -513,6 +588,56 @@ export async function play_round(state: GameState, player_bid: number, graph: Gr
     return { status: "ok", round: rec, aiReasons: desc };
 }
 
+export async function play_round(state: GameState, player_bid: number, graph: GraphLike = getGraph()): Promise<RoundOutcome> {
+    const start = begin_round(state);
+    if ("status" in start) {
+        return start;
+    }
+
+    // Get bid from AI
+    const [a_bid, desc] = await chooseBid(graph as any, state as any, "AI");
+
+    return resolve_round(state, start, player_bid, a_bid, desc);
+}
+
+// Offline self-play sweep: both sides are played by the agent. Every round, the pending
+// decisions of all still-running games go out as one concurrent batch.
+// With a seed, game i / side k draws its bids from seed-derived streams, so sweeps replay exactly.
+export async function run_self_play(games: number, graph: BatchGraphLike = getGraph() as any, seed?: number): Promise<GameState[]> {
+    const states = Array.from({ length: games }, () => create_initial_state());
+    const seeds = new Map<GameState, number>(states.map((state, i) => [state, i]));
+    const side_seed = (state: GameState, side: number) =>
+        seed === undefined ? undefined : seed + 2 * seeds.get(state)! + side;
+    let active = states;
+
+    while (active.length > 0) {
+        const started: Array<[GameState, RoundStart]> = [];
+        for (const state of active) {
+            const start = begin_round(state);
+            if (!("status" in start)) {
+                started.push([state, start]);
+            }
+        }
+
+        const agent_states = started.flatMap(([state]) => [
+            buildAgentState(state as any, "PLAYER", "neutral", LOOKBACK_ROUNDS, MAINTENANCE_ROUND_INTERVAL, MAINTENANCE_COST_INCREMENT, side_seed(state, 0)),
+            buildAgentState(state as any, "AI", "neutral", LOOKBACK_ROUNDS, MAINTENANCE_ROUND_INTERVAL, MAINTENANCE_COST_INCREMENT, side_seed(state, 1)),
+        ]);
+        const bids = await chooseBidsBatch(graph, agent_states);
+
+        active = [];
+        started.forEach(([state, start], i) => {
+            const [p_bid] = bids[2 * i];
+            const [a_bid, desc] = bids[2 * i + 1];
+            if (resolve_round(state, start, p_bid, a_bid, desc).status === "ok") {
+                active.push(state);
+            }
+        });
+    }
+
+    return states;
+}
+
 // Console-driven CLI removed; drive the game via frontend/API using play_round and report helpers.
 
 async function game_loop() {
@@ -527,132 +652,93 @@ async function game_loop() {
         []
     );
 
-    const graph = buildPipeline()
+    const graph = getPipeline()
 
+    // async prompt (unlike a synchronous one) keeps the event loop free for the AI request
+    const rl = readline.createInterface({ input: process.stdin, output: process.stdout });
 
-    // Starting game loop
-    while (true) {
+    try {
+        return await run_rounds(state, graph, rl);
+    }
+    finally {
+        rl.close();
+    }
+}
 
-        // Storing player's money at the start of the game (before maintenance costs)
-        const p_money_before_m = state.player.money;
-        const a_money_before_m = state.ai.money;
 
-        // Calculating maintenance fee
-        const m_fee = calculate_maintenance_fee(state.current_round);
 
-        // Store maintenance fee of current round in state
-        state.maintenance_fee_current = m_fee
+// function to read a valid bid from the player without blocking the event loop
+async function prompt_bid(rl: readline.Interface, max_bid: number): Promise<number> {
+    while (true) {
+        const answer = (await rl.question(`Enter your bid (0-${max_bid}): `)).trim();
+        // digits only, as strict as readlineSync.questionInt (rejects "1e1", "0x10", "")
+        const bidInput = /^\d+$/.test(answer) ? Number(answer) : NaN;
+        if (!Number.isInteger(bidInput) || bidInput < 0 || bidInput > max_bid) {
+            console.log(`Bid must be an integer between 0 and ${max_bid}. Try again.`);
+            continue;
+        }
+        return bidInput;
+    }
+}
 
-        // Apply maintenance fees and check that everyone can pay
-        const ok = apply_maintenance_fee(state, state.player, state.ai)
 
-        // Storing player's money after paying maintenance fees and before bid
-        const p_money_before_b = state.player.money
-        const a_money_before_b = state.ai.money
 
-        if (!ok) {
-            if (p_money_before_m < m_fee && a_money_before_m < m_fee) {
-                console.log("Both players could not afford maintenance fees.")
-                console.log("Game Ended!")
-                return state
-            }
-            else if (p_money_before_m < m_fee) {
-                console.log("PLAYER could not afford maintenance fees.")
-                walkover("PLAYER", state)
-                return state
-            }
-            else {
-                console.log("AI could not afford maintenance fees.")
-                walkover("AI", state)
-                return state
-            }
+async function run_rounds(state: GameState, graph: GraphLike, rl: readline.Interface): Promise<GameState> {
+
+    // Starting game loop
+    while (true) {
+
+        // Charge maintenance (ends the game with a walkover if someone can't pay)
+        const start = begin_round(state);
+        if ("status" in start) {
+            return state
         }
 
         // Print round status
         print_round_status(state)
-        
-        // Get bid from player
-        let p_bid = 0;
-        while (true) {
-            const bidInput = readlineSync.questionInt(
-                `Enter your bid (0-${state.player.money}): `,
-            );
-            if (!Number.isInteger(bidInput) || bidInput < 0 || bidInput > state.player.money) {
-                console.log(`Bid must be an integer between 0 and ${state.player.money}. Try again.`);
-                continue;
-            }
-            p_bid = bidInput;
-            break;
-        }
-
-        // Get bid from AI
-        const [a_bid, desc] = await chooseBid(graph as any, state as any, "AI");
-
-        // determine winner
-        const winner = round_winner(p_bid, a_bid)
-        apply_payment(state.player, state.ai, p_bid, a_bid)
-        award_point(state.player, state.ai, winner)
-
-        // Record round data
-        const rec = new RoundRecord(
-            state.current_round,
-            p_bid,
-            a_bid,
-            winner,
-            state.maintenance_fee_current,
-
-            state.player.score,
-            p_money_before_m,
-            p_money_before_b,
-            state.player.money,
 
-            state.ai.score,
-            a_money_before_m,
-            a_money_before_b,
-            state.ai.money,
-        );
+        // Start the AI bid first so the LLM call runs while the player is typing
+        const ai_bid_task = chooseBid(graph as any, state as any, "AI");
+        // avoid an unhandled-rejection crash before we get around to awaiting it
+        ai_bid_task.catch(() => {});
 
-        // add round record to gamestate history
-        state.history.push(rec);
+        // Get bid from player
+        const p_bid = await prompt_bid(rl, state.player.money);
 
-        // reveal bids, scores, and balance
-        print_reveal(rec)
+        // Get bid from AI
+        const [a_bid, desc] = await ai_bid_task;
 
-        // Print AI reasoning??
+        // settle the round; reveal it before any elimination/walkover output
+        const outcome = resolve_round(state, start, p_bid, a_bid, desc, (rec) => {
+            // reveal bids, scores, and balance
+            print_reveal(rec)
 
-        console.log("\nAI reasons:");
-        desc.forEach((r, i) => console.log(`${i + 1}. ${r}`));
+            console.log("\nAI reasons:");
+            desc.forEach((r, i) => console.log(`${i + 1}. ${r}`));
 
-        // Print winner msg
-        if (winner == null) {
-            console.log(`\nResult: TIE!\n`)
-        }
-        else {
-            console.log(`\nResult: ${winner} won this round!\n`)
-        }
+            // Print winner msg
+            if (rec.winner == null) {
+                console.log(`\nResult: TIE!\n`)
+            }
+            else {
+                console.log(`\nResult: ${rec.winner} won this round!\n`)
+            }
+        });
 
-        // immediate elimination due to bidding
-        if (state.player.money == 0 && state.ai.money == 0) {
-            console.log("\nBoth players hit $0. Game ends")
-        }
-        else if (state.player.money == 0) {
-            console.log("\nPLAYER hit $0. Game ends")
-            walkover("PLAYER", state, true)
-        }
-        else if (state.ai.money == 0) {
-            console.log("\nAI hit $0. Game ends")
-            walkover("AI", state, true)
+        if (outcome.status === "ended") {
+            return state
         }
-        state.current_round += 1
     }
 }
 
 
 
-(async () => {
+// only start the interactive CLI when run directly, not when imported (API route, self-play)
+if (process.argv[1] && import.meta.url === pathToFileURL(process.argv[1]).href) (async () => {
 
     const state = await game_loop();
     console.log("\n===============GAME ENDED===============");
-    const report = await generateReport(build_report_context(state))
-    console.log(report)
+    // stream the report to the terminal as it is generated
+    await generateReport(build_report_context(state), undefined, (text) => process.stdout.write(text))
+    process.stdout.write("\n")
 })();